@@ -2,16 +2,19 @@
 
 from __future__ import annotations
 
-import asyncio
 import logging
-from typing import Any, Dict
+from datetime import datetime
+from typing import Any, Dict, Literal
 
-from fastapi import Depends, FastAPI, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 
 from gateway import GatewayManager
+from gateway.admission import OverloadedError
 from gateway.config import GatewayConfig
+from gateway.frames import DEFAULT_FORMAT, negotiate
+from gateway.scheduler import SchedulerFullError
 
 
 logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s - %(name)s: %(message)s")
@@ -27,11 +30,21 @@ class SendMessageSchema(BaseModel):
     target: str
     content: str
     at_list: list[str] | None = None
+    channel: str | None = None
+    idempotency_key: str | None = None
+    send_at: datetime | None = None
+    delay: float | None = None
+    priority: str | None = None
 
 
 class SendImageSchema(BaseModel):
     target: str
     image_url: str
+    channel: str | None = None
+    idempotency_key: str | None = None
+    send_at: datetime | None = None
+    delay: float | None = None
+    priority: str | None = None
 
 
 async def token_guard(x_access_token: str | None = Header(default=None)):
@@ -40,6 +53,16 @@ async def token_guard(x_access_token: str | None = Header(default=None)):
     return True
 
 
+@app.exception_handler(OverloadedError)
+async def overloaded_handler(request: Request, exc: OverloadedError) -> JSONResponse:
+    """Shed load quickly and tell the caller when to come back."""
+    return JSONResponse(
+        {"detail": str(exc)},
+        status_code=503,
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
 @app.on_event("startup")
 async def on_startup() -> None:
     await manager.start()
@@ -52,33 +75,115 @@ async def on_shutdown() -> None:
 
 @app.get("/health")
 async def health_check() -> Dict[str, Any]:
+    """Liveness probe: the process is up."""
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def readiness_check() -> JSONResponse:
+    """Readiness probe: token prefetched and upstream connections warm."""
+    state = manager.readiness()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
+
+
+@app.get("/stats")
+async def stats(guard: bool = Depends(token_guard)) -> Dict[str, Any]:
+    return manager.stats()
+
+
+@app.get("/debug/traces")
+async def debug_traces(
+    order: Literal["recent", "slowest"] = "recent",
+    limit: int = Query(50, ge=1, le=config.trace_buffer_size),
+    guard: bool = Depends(token_guard),
+) -> Dict[str, Any]:
+    """Recently sampled event traces with per-stage timings (TRACE_SAMPLE_RATE > 0)."""
+    return {
+        "sample_rate": manager.tracer.sample_rate,
+        "traces": manager.tracer.traces(order=order, limit=limit),
+    }
+
+
+def _is_urgent(*priorities: str | None) -> bool:
+    """Only "urgent" selects the priority lane; other values (e.g. X-Priority: 1) are ignored."""
+    return any(priority and priority.strip().lower() == "urgent" for priority in priorities)
+
+
 @app.post("/send_message")
-async def send_message(payload: SendMessageSchema, guard: bool = Depends(token_guard)) -> JSONResponse:
-    result = await manager.send_text(payload.model_dump())
+async def send_message(
+    payload: SendMessageSchema,
+    idempotency_key: str | None = Header(default=None),
+    x_priority: str | None = Header(default=None),
+    guard: bool = Depends(token_guard),
+) -> JSONResponse:
+    """Send text message. Retries with the same Idempotency-Key are sent once."""
+    try:
+        result = await manager.send_text(
+            payload.model_dump(),
+            idempotency_key or payload.idempotency_key,
+            urgent=_is_urgent(x_priority, payload.priority),
+        )
+    except SchedulerFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return JSONResponse(result)
 
 
 @app.post("/send_image")
-async def send_image(payload: SendImageSchema, guard: bool = Depends(token_guard)) -> JSONResponse:
+async def send_image(
+    payload: SendImageSchema,
+    idempotency_key: str | None = Header(default=None),
+    x_priority: str | None = Header(default=None),
+    guard: bool = Depends(token_guard),
+) -> JSONResponse:
     """Send image message (Feishu only for now)."""
-    result = await manager.send_image(payload.model_dump())
+    try:
+        result = await manager.send_image(
+            payload.model_dump(),
+            idempotency_key or payload.idempotency_key,
+            urgent=_is_urgent(x_priority, payload.priority),
+        )
+    except SchedulerFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return JSONResponse(result)
 
 
+@app.delete("/scheduled/{schedule_id}")
+async def cancel_scheduled(schedule_id: str, guard: bool = Depends(token_guard)) -> Dict[str, Any]:
+    """Cancel a send scheduled with send_at/delay."""
+    if not manager.cancel_scheduled(schedule_id):
+        raise HTTPException(status_code=404, detail="Scheduled send not found")
+    return {"status": "cancelled", "schedule_id": schedule_id}
+
+
 @app.post("/feishu/webhook")
 async def feishu_webhook(request: Request) -> Dict[str, Any]:
     """
     Feishu event subscription webhook endpoint.
     Handles URL verification and message events from Feishu.
     """
+    if manager.feishu_webhook_channel() is None:
+        raise HTTPException(status_code=404, detail="No Feishu webhook channel")
+    return await _handle_feishu_webhook(request, None)
+
+
+@app.post("/feishu/{channel}/webhook")
+async def feishu_channel_webhook(channel: str, request: Request) -> Dict[str, Any]:
+    """Webhook endpoint for a named Feishu channel in multi-channel mode."""
+    if manager.feishu_webhook_channel(channel) is None:
+        raise HTTPException(status_code=404, detail="Unknown Feishu webhook channel")
+    return await _handle_feishu_webhook(request, channel)
+
+
+async def _handle_feishu_webhook(request: Request, channel: str | None) -> Dict[str, Any]:
     try:
         event_data = await request.json()
         logger.debug(f"[Feishu] Received webhook event: {event_data.get('header', {}).get('event_type')}")
         
-        result = await manager.handle_feishu_webhook(event_data)
+        result = await manager.handle_feishu_webhook(event_data, channel)
         return result
     except Exception as e:
         logger.error(f"[Feishu] Error handling webhook: {e}", exc_info=True)
@@ -91,12 +196,21 @@ async def websocket_endpoint(websocket: WebSocket):
     if config.access_token and token != config.access_token:
         await websocket.close(code=4403)
         return
-    await websocket.accept()
+    # Compact formats are opt-in via Sec-WebSocket-Protocol; plain JSON otherwise
+    frame_format = negotiate(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=frame_format.name if frame_format else None)
+    frame_format = frame_format or DEFAULT_FORMAT
     queue = await manager.register_listener()
     try:
         while True:
             event = await queue.get()
-            await websocket.send_json(event)
+            frame = event.encode(frame_format)
+            if frame_format.binary:
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+            # First subscriber only, so a trace ends at the first delivery
+            manager.tracer.mark(event.event.get("trace_id"), "ws_sent", once=True)
     except WebSocketDisconnect:
         pass
     finally:
@@ -106,8 +220,9 @@ async def websocket_endpoint(websocket: WebSocket):
 def run():  # pragma: no cover - helper for uvicorn
     import uvicorn
 
+    # Pass the app object so the module is not imported (and configured) twice
     uvicorn.run(
-        "app:app",
+        app,
         host=config.listen_host,
         port=config.listen_port,
         reload=False,
@@ -0,0 +1,91 @@
+"""Adaptive admission control for the send API."""
+
+from __future__ import annotations
+
+import contextlib
+import math
+import time
+from typing import Any, Dict, Iterator
+
+
+class OverloadedError(Exception):
+    """Raised when a request is shed because the endpoint is at its limit."""
+
+    def __init__(self, message: str, retry_after: int) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit for one endpoint, driven by upstream latency.
+
+    While upstream calls finish within ``target_latency`` and the limit is in
+    use, it grows by ``1/limit`` per call (about +1 per round trip); slow
+    calls multiply it by ``backoff`` at most once per round trip (the latency
+    EWMA), so one slow burst costs a single step. Requests over the limit are rejected at
+    once instead of queueing. The top ``urgent_reserve`` share of the limit is
+    kept free for urgent requests.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 200,
+        target_latency: float = 1.0,
+        backoff: float = 0.9,
+        urgent_reserve: float = 0.2,
+    ) -> None:
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.urgent_reserve = urgent_reserve
+        self._inflight = 0
+        self._latency_ewma = 0.0
+        self._last_decrease = float("-inf")
+        self._admitted = 0
+        self._rejected = {"normal": 0, "urgent": 0}
+
+    @contextlib.contextmanager
+    def admit(self, urgent: bool = False) -> Iterator[None]:
+        """Hold a concurrency slot for the duration of the block or raise OverloadedError."""
+        lane = "urgent" if urgent else "normal"
+        capacity = self.limit if urgent else self.limit * (1 - self.urgent_reserve)
+        if self._inflight >= max(1, int(capacity)):
+            self._rejected[lane] += 1
+            raise OverloadedError(f"{self.name} is overloaded, retry later", self.retry_after)
+
+        self._inflight += 1
+        self._admitted += 1
+        try:
+            yield
+        finally:
+            self._inflight -= 1
+
+    def observe(self, latency: float, ok: bool = True) -> None:
+        """Feed one upstream call latency (seconds) into the limit."""
+        self._latency_ewma = latency if not self._latency_ewma else 0.8 * self._latency_ewma + 0.2 * latency
+        if latency > self.target_latency:
+            now = time.monotonic()
+            if now - self._last_decrease >= max(self._latency_ewma, self.target_latency):
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                self._last_decrease = now
+        elif ok and self._inflight >= self.limit / 2:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+    @property
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._latency_ewma))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "inflight": self._inflight,
+            "admitted": self._admitted,
+            "rejected": dict(self._rejected),
+            "latency_ewma_ms": round(self._latency_ewma * 1000, 1),
+        }
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Any, AsyncIterator, Dict, Set
+from typing import Any, Set
 
 
 class MessageBroker:
@@ -27,7 +27,7 @@ class MessageBroker:
         async with self._lock:
             self._subscribers.discard(queue)
 
-    def publish(self, event: Dict[str, Any]) -> None:
+    def publish(self, event: Any) -> None:
         """Publish event to all subscribers (sync version for backward compatibility)."""
         if not self._subscribers:
             return
@@ -37,7 +37,7 @@ class MessageBroker:
         for queue in list(self._subscribers):
             asyncio.run_coroutine_threadsafe(self._safe_put(queue, event), self._loop)
     
-    async def async_publish(self, event: Dict[str, Any]) -> None:
+    async def async_publish(self, event: Any) -> None:
         """Publish event to all subscribers asynchronously (faster)."""
         if not self._subscribers:
             return
@@ -48,7 +48,7 @@ class MessageBroker:
             return_exceptions=True
         )
 
-    async def _safe_put(self, queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+    async def _safe_put(self, queue: asyncio.Queue, event: Any) -> None:
         try:
             await queue.put(event)
         except asyncio.QueueFull:
@@ -0,0 +1,137 @@
+"""Outbound text coalescing: merge bursts of small messages to the same chat."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+from .events import OutgoingMessageRequest
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Batch:
+    items: List[Tuple[OutgoingMessageRequest, asyncio.Future]] = field(default_factory=list)
+    size: int = 0
+    urgent: bool = False
+    timer: asyncio.TimerHandle | None = None
+
+
+class SendCoalescer:
+    """Merge texts sent to the same channel and target within a linger window into one message.
+
+    Messages keep their original order, a merged message never exceeds
+    ``max_chars`` (unless a single text is already longer), and every caller
+    gets its own acknowledgment once the merged message is sent.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[OutgoingMessageRequest, bool], Awaitable[None]],
+        window: float,
+        max_chars: int = 4000,
+        separator: str = "\n",
+    ) -> None:
+        self._send = send
+        self.window = window
+        self.max_chars = max_chars
+        self.separator = separator
+        self._buckets: Dict[Tuple[str | None, str], _Batch] = {}
+        # Last send per (channel, target), so batches for one chat go out in order
+        self._tails: Dict[Tuple[str | None, str], asyncio.Task] = {}
+        self._submitted = 0
+        self._api_calls = 0
+
+    async def submit(self, request: OutgoingMessageRequest, urgent: bool = False) -> Dict[str, Any]:
+        """Queue ``request`` for its target and wait until its batch is sent.
+
+        A batch is sent as urgent if any of its requests is.
+        """
+        loop = asyncio.get_running_loop()
+        key = (request.channel, request.target)
+
+        batch = self._buckets.get(key)
+        if batch and batch.size + len(self.separator) + len(request.content) > self.max_chars:
+            self._flush(key, batch)
+            batch = None
+        if batch is None:
+            batch = _Batch()
+            batch.timer = loop.call_later(self.window, self._flush, key, batch)
+            self._buckets[key] = batch
+
+        future = loop.create_future()
+        if batch.items:
+            batch.size += len(self.separator)
+        batch.items.append((request, future))
+        batch.size += len(request.content)
+        batch.urgent = batch.urgent or urgent
+        self._submitted += 1
+        return await asyncio.shield(future)
+
+    def _flush(self, key: Tuple[str | None, str], batch: _Batch) -> None:
+        if self._buckets.get(key) is batch:
+            del self._buckets[key]
+        if batch.timer:
+            batch.timer.cancel()
+        previous = self._tails.get(key)
+        task = asyncio.create_task(self._send_batch(batch, previous))
+        self._tails[key] = task
+        task.add_done_callback(functools.partial(self._release_tail, key))
+
+    def _release_tail(self, key: Tuple[str | None, str], task: asyncio.Task) -> None:
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    async def _send_batch(self, batch: _Batch, previous: asyncio.Task | None) -> None:
+        if previous:
+            await asyncio.wait([previous])
+
+        first = batch.items[0][0]
+        at_list: List[str] = []
+        for request, _ in batch.items:
+            for user in request.at_list or []:
+                if user not in at_list:
+                    at_list.append(user)
+        merged = OutgoingMessageRequest(
+            target=first.target,
+            content=self.separator.join(request.content for request, _ in batch.items),
+            at_list=at_list or None,
+            channel=first.channel,
+        )
+
+        self._api_calls += 1
+        try:
+            await self._send(merged, batch.urgent)
+        except Exception as exc:
+            for _, future in batch.items:
+                if not future.done():
+                    future.set_exception(exc)
+                    future.exception()  # Mark retrieved if the caller went away
+            return
+
+        if len(batch.items) > 1:
+            logger.debug(f"Coalesced {len(batch.items)} messages to {first.target}")
+        for position, (_, future) in enumerate(batch.items):
+            if not future.done():
+                future.set_result({"status": "sent", "coalesced": len(batch.items), "position": position})
+
+    async def close(self) -> None:
+        """Send everything still lingering and wait for in-flight batches."""
+        for key, batch in list(self._buckets.items()):
+            self._flush(key, batch)
+        if self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+    def stats(self) -> Dict[str, Any]:
+        pending = sum(len(batch.items) for batch in self._buckets.values())
+        return {
+            "window_ms": int(self.window * 1000),
+            "submitted": self._submitted,
+            "pending": pending,
+            "api_calls": self._api_calls,
+            "api_calls_saved": self._submitted - pending - self._api_calls,
+        }
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 import os
 from dataclasses import dataclass
-from typing import Literal
+from typing import Literal, Tuple
 from pathlib import Path
 
 # Load .env file if exists
@@ -17,6 +17,19 @@ except ImportError:
     pass  # python-dotenv not installed
 
 
+@dataclass(frozen=True)
+class ChannelConfig:
+    """Settings for one named channel hosted by the gateway."""
+
+    name: str
+    channel_type: Literal["wechat", "feishu"] = "feishu"
+    feishu_app_id: str | None = None
+    feishu_app_secret: str | None = None
+    feishu_verification_token: str | None = None
+    feishu_event_mode: Literal["webhook", "long_connection"] = "webhook"
+    feishu_domain: str = "https://open.feishu.cn"
+
+
 @dataclass(frozen=True)
 class GatewayConfig:
     """Runtime configuration loaded from environment variables."""
@@ -31,6 +44,26 @@ class GatewayConfig:
     feishu_app_id: str | None = None
     feishu_app_secret: str | None = None
     feishu_verification_token: str | None = None
+    feishu_event_mode: Literal["webhook", "long_connection"] = "webhook"
+    feishu_domain: str = "https://open.feishu.cn"
+    
+    # Multi-channel mode: named channels, each configured via CHANNEL_<NAME>_* variables
+    channels: Tuple[ChannelConfig, ...] = ()
+    
+    # Send API settings
+    idempotency_ttl: float = 600.0
+    idempotency_max_keys: int = 10000
+    coalesce_window_ms: int = 0  # 0 disables coalescing
+    coalesce_max_chars: int = 4000
+    schedule_store_path: str | None = None  # None keeps scheduled sends in memory only
+    schedule_max_pending: int = 100000
+    admission_initial_limit: int = 20
+    admission_max_limit: int = 200
+    admission_target_latency_ms: int = 1000
+    
+    # Diagnostics
+    trace_sample_rate: float = 0.0  # 0 disables tracing
+    trace_buffer_size: int = 256
 
     @classmethod
     def load(cls) -> "GatewayConfig":
@@ -43,6 +76,34 @@ class GatewayConfig:
         feishu_app_id = os.getenv("FEISHU_APP_ID")
         feishu_app_secret = os.getenv("FEISHU_APP_SECRET")
         feishu_verification_token = os.getenv("FEISHU_VERIFICATION_TOKEN")
+        feishu_event_mode = os.getenv("FEISHU_EVENT_MODE", "webhook")
+        feishu_domain = os.getenv("FEISHU_DOMAIN", "https://open.feishu.cn")
+        
+        # Multi-channel configuration, e.g. CHANNELS=home,office,wx
+        channels = tuple(
+            cls._load_channel(name.strip(), feishu_event_mode, feishu_domain)
+            for name in os.getenv("CHANNELS", "").split(",")
+            if name.strip()
+        )
+        
+        # Send API configuration
+        idempotency_ttl = float(os.getenv("IDEMPOTENCY_TTL", "600"))
+        idempotency_max_keys = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+        coalesce_window_ms = int(os.getenv("COALESCE_WINDOW_MS", "0"))
+        coalesce_max_chars = int(os.getenv("COALESCE_MAX_CHARS", "4000"))
+        schedule_store_path = os.getenv("SCHEDULE_STORE_PATH") or None
+        schedule_max_pending = int(os.getenv("SCHEDULE_MAX_PENDING", "100000"))
+        admission_initial_limit = int(os.getenv("ADMISSION_INITIAL_LIMIT", "20"))
+        admission_max_limit = int(os.getenv("ADMISSION_MAX_LIMIT", "200"))
+        admission_target_latency_ms = int(os.getenv("ADMISSION_TARGET_LATENCY_MS", "1000"))
+        
+        # Diagnostics
+        trace_sample_rate = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+        trace_buffer_size = int(os.getenv("TRACE_BUFFER_SIZE", "256"))
+        if not 0 <= trace_sample_rate <= 1:
+            raise ValueError(f"TRACE_SAMPLE_RATE must be between 0 and 1, got {trace_sample_rate}")
+        if trace_buffer_size < 1:
+            raise ValueError(f"TRACE_BUFFER_SIZE must be at least 1, got {trace_buffer_size}")
         
         return cls(
             channel_type=channel_type,
@@ -52,4 +113,47 @@ class GatewayConfig:
             feishu_app_id=feishu_app_id,
             feishu_app_secret=feishu_app_secret,
             feishu_verification_token=feishu_verification_token,
+            feishu_event_mode=feishu_event_mode,
+            feishu_domain=feishu_domain,
+            channels=channels,
+            idempotency_ttl=idempotency_ttl,
+            idempotency_max_keys=idempotency_max_keys,
+            coalesce_window_ms=coalesce_window_ms,
+            coalesce_max_chars=coalesce_max_chars,
+            schedule_store_path=schedule_store_path,
+            schedule_max_pending=schedule_max_pending,
+            admission_initial_limit=admission_initial_limit,
+            admission_max_limit=admission_max_limit,
+            admission_target_latency_ms=admission_target_latency_ms,
+            trace_sample_rate=trace_sample_rate,
+            trace_buffer_size=trace_buffer_size,
+        )
+
+    @staticmethod
+    def _load_channel(name: str, default_event_mode: str, default_domain: str) -> ChannelConfig:
+        prefix = f"CHANNEL_{name.upper().replace('-', '_')}_"
+        return ChannelConfig(
+            name=name,
+            channel_type=os.getenv(f"{prefix}TYPE", "feishu"),
+            feishu_app_id=os.getenv(f"{prefix}FEISHU_APP_ID"),
+            feishu_app_secret=os.getenv(f"{prefix}FEISHU_APP_SECRET"),
+            feishu_verification_token=os.getenv(f"{prefix}FEISHU_VERIFICATION_TOKEN"),
+            feishu_event_mode=os.getenv(f"{prefix}FEISHU_EVENT_MODE", default_event_mode),
+            feishu_domain=os.getenv(f"{prefix}FEISHU_DOMAIN", default_domain),
+        )
+
+    def channel_configs(self) -> Tuple[ChannelConfig, ...]:
+        """Channels to host; without CHANNELS, one "default" channel from the top-level settings."""
+        if self.channels:
+            return self.channels
+        return (
+            ChannelConfig(
+                name="default",
+                channel_type=self.channel_type,
+                feishu_app_id=self.feishu_app_id,
+                feishu_app_secret=self.feishu_app_secret,
+                feishu_verification_token=self.feishu_verification_token,
+                feishu_event_mode=self.feishu_event_mode,
+                feishu_domain=self.feishu_domain,
+            ),
         )
@@ -26,6 +26,8 @@ class IncomingMessageEvent:
     room_id: str | None = None
     room_name: str | None = None
     at_me: bool | None = None
+    channel: str | None = None
+    trace_id: str | None = None
 
     def asdict(self) -> Dict[str, Any]:
         data = asdict(self)
@@ -40,6 +42,7 @@ class OutgoingMessageRequest:
     target: str
     content: str
     at_list: list[str] | None = None
+    channel: str | None = None
 
     def normalized(self) -> Dict[str, Any]:
         payload: Dict[str, Any] = {
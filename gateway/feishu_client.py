@@ -7,15 +7,18 @@ import json
 import logging
 import time
 from typing import Any, Callable, Dict, Optional
-from dataclasses import asdict
 
 import aiohttp
-import requests
 
 from .events import IncomingMessageEvent, OutgoingMessageRequest
+from .feishu_ws import DEFAULT_DOMAIN, FeishuLongConnection
+from .tracing import Trace, Tracer
 
 logger = logging.getLogger(__name__)
 
+# Feishu rejects message images larger than 10 MB
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+
 
 class FeishuClientError(Exception):
     """Base exception for Feishu client failures."""
@@ -30,6 +33,10 @@ class FeishuClient:
         app_secret: str,
         verification_token: str,
         on_message: Callable[[IncomingMessageEvent], None],
+        event_mode: str = "webhook",
+        domain: str = DEFAULT_DOMAIN,
+        session: Optional[aiohttp.ClientSession] = None,
+        tracer: Optional[Tracer] = None,
     ) -> None:
         """
         Initialize Feishu client.
@@ -39,17 +46,79 @@ class FeishuClient:
             app_secret: Feishu application secret
             verification_token: Token for webhook verification
             on_message: Callback function for incoming messages
+            event_mode: "webhook" or "long_connection"
+            domain: Open platform base URL
+            session: Shared HTTP session (one is created on demand if omitted)
+            tracer: Optional tracer for per-stage event timings
         """
         self.app_id = app_id
         self.app_secret = app_secret
         self.verification_token = verification_token
+        self.event_mode = event_mode
+        self.domain = domain.rstrip("/")
         self._on_message = on_message
+        self._tracer = tracer
+        self._long_connection: Optional[FeishuLongConnection] = None
+        self._session = session
+        self._owns_session = session is None
         self._access_token: Optional[str] = None
         self._token_expires_at: float = 0
+        self._token_lock = asyncio.Lock()
         self._contact_cache: Dict[str, str] = {}
         
         logger.info(f"[Feishu] Client initialized with app_id: {app_id[:10]}...")
 
+    async def start(self) -> None:
+        """Start receiving events (only needed in long connection mode)."""
+        if self.event_mode == "long_connection" and not self._long_connection:
+            self._long_connection = FeishuLongConnection(
+                app_id=self.app_id,
+                app_secret=self.app_secret,
+                on_event=self.dispatch_event,
+                domain=self.domain,
+                session=self._get_session(),
+            )
+            await self._long_connection.start()
+            logger.info("[Feishu] Long connection receiver started")
+
+    async def stop(self) -> None:
+        if self._long_connection:
+            await self._long_connection.stop()
+            self._long_connection = None
+        if self._owns_session and self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def warm_up(self, timeout: float = 10) -> None:
+        """
+        Prefetch the tenant token so the first send skips token, DNS and TLS setup.
+        
+        The token request leaves a kept-alive connection to the open platform in
+        the session pool, which the first real send then reuses.
+        """
+        await self._get_access_token()
+        if self._long_connection and not await self._long_connection.wait_connected(timeout):
+            raise FeishuClientError("Long connection not established")
+        logger.info("[Feishu] Warm-up complete")
+
+    @property
+    def ready(self) -> bool:
+        """True once a token has been fetched and events can be received."""
+        # An expired token is refreshed on the next send, so it does not affect readiness
+        if not self._access_token:
+            return False
+        if self._long_connection:
+            return self._long_connection.connected
+        return True
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled HTTP session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+        return self._session
+
     async def handle_webhook(self, event_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Handle incoming webhook event from Feishu.
@@ -60,22 +129,40 @@ class FeishuClient:
         Returns:
             Response dict for Feishu server
         """
+        trace = self._tracer.start() if self._tracer else None
+        
         # 1. Handle URL verification
         if event_data.get("type") == "url_verification":
             challenge = event_data.get("challenge", "")
             logger.info("[Feishu] URL verification request received")
             return {"challenge": challenge}
         
-        # 2. Verify token
+        # 2. Verify token; long connection mode has none, so webhook posts are never trusted
+        if self.event_mode != "webhook" or not self.verification_token:
+            logger.warning("[Feishu] Webhook event rejected: webhook mode is not enabled")
+            return {"success": False, "error": "webhook_disabled"}
         header = event_data.get("header", {})
         if header.get("token") != self.verification_token:
             logger.warning("[Feishu] Invalid verification token")
             return {"success": False, "error": "invalid_token"}
         
         # 3. Handle message events
+        if trace:
+            trace.mark("verified")
+        return await self.dispatch_event(event_data, trace)
+
+    async def dispatch_event(self, event_data: Dict[str, Any], trace: Optional[Trace] = None) -> Dict[str, Any]:
+        """
+        Route an authenticated event to its handler.
+        
+        Shared by the webhook and the long connection receiver.
+        """
+        header = event_data.get("header", {})
         if header.get("event_type") == "im.message.receive_v1":
+            if trace is None and self._tracer:
+                trace = self._tracer.start()
             try:
-                await self._handle_message_event(event_data)
+                await self._handle_message_event(event_data, trace)
                 return {"success": True}
             except Exception as e:
                 logger.error(f"[Feishu] Error handling message event: {e}", exc_info=True)
@@ -84,7 +171,7 @@ class FeishuClient:
         logger.debug(f"[Feishu] Unhandled event type: {header.get('event_type')}")
         return {"success": True}
 
-    async def _handle_message_event(self, event_data: Dict[str, Any]) -> None:
+    async def _handle_message_event(self, event_data: Dict[str, Any], trace: Optional[Trace] = None) -> None:
         """Process incoming message event."""
         event = event_data.get("event", {})
         message = event.get("message", {})
@@ -122,6 +209,9 @@ class FeishuClient:
             logger.error("[Feishu] Failed to parse message content")
             return
         
+        if trace:
+            trace.mark("parsed")
+        
         # Build incoming message event
         sender_id = sender.get("sender_id", {}).get("open_id", "")
         sender_name = await self._get_user_name(sender_id)
@@ -129,6 +219,9 @@ class FeishuClient:
         room_id = message.get("chat_id") if is_group else None
         room_name = await self._get_chat_name(room_id) if room_id else None
         
+        if trace:
+            trace.mark("resolved")
+        
         incoming_event = IncomingMessageEvent(
             msg_id=msg_id,
             sender=sender_id,
@@ -144,6 +237,15 @@ class FeishuClient:
         
         logger.info(f"[Feishu] Received message from {sender_name}: {content[:50]}")
         
+        if trace:
+            # Time from Feishu creating the event until it reached us
+            create_time = event_data.get("header", {}).get("create_time")
+            if create_time:
+                trace.meta["feishu_delay_ms"] = round(trace.started_at * 1000 - int(create_time), 1)
+            trace.meta["msg_id"] = msg_id
+            incoming_event.trace_id = trace.trace_id
+            self._tracer.commit(trace)
+        
         # Trigger callback directly (no thread executor needed)
         self._on_message(incoming_event)
 
@@ -172,7 +274,7 @@ class FeishuClient:
         else:
             receive_id_type = "open_id"
         
-        url = "https://open.feishu.cn/open-apis/im/v1/messages"
+        url = f"{self.domain}/open-apis/im/v1/messages"
         params = {"receive_id_type": receive_id_type}
         
         data = {
@@ -182,15 +284,15 @@ class FeishuClient:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, params=params, json=data, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    result = await response.json()
+            session = self._get_session()
+            async with session.post(url, headers=headers, params=params, json=data, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                result = await response.json()
                     
-                    if result.get("code") == 0:
-                        logger.info(f"[Feishu] Message sent successfully to {request.target}")
-                    else:
-                        logger.error(f"[Feishu] Failed to send message: {result.get('msg')}")
-                        raise FeishuClientError(f"Send message failed: {result.get('msg')}")
+                if result.get("code") == 0:
+                    logger.info(f"[Feishu] Message sent successfully to {request.target}")
+                else:
+                    logger.error(f"[Feishu] Failed to send message: {result.get('msg')}")
+                    raise FeishuClientError(f"Send message failed: {result.get('msg')}")
         except Exception as e:
             logger.error(f"[Feishu] Error sending message: {e}")
             raise FeishuClientError(f"Failed to send message: {e}")
@@ -203,19 +305,45 @@ class FeishuClient:
             target: Target user or group ID
             image_url: URL of the image to send
         """
-        access_token = await self._get_access_token()
+        image_data = await self.download_image(image_url)
+        await self.send_image_data(target, image_data)
+
+    async def download_image(self, image_url: str) -> bytes:
+        """
+        Download an image from its source (not a Feishu API call).
         
-        # 1. Download image
+        Args:
+            image_url: URL of the image to download
+        """
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(image_url, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    image_data = await response.read()
+            session = self._get_session()
+            async with session.get(image_url, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if (response.content_length or 0) > MAX_IMAGE_BYTES:
+                    raise FeishuClientError(f"Image is larger than {MAX_IMAGE_BYTES} bytes")
+                chunks = []
+                size = 0
+                async for chunk in response.content.iter_chunked(64 * 1024):
+                    size += len(chunk)
+                    if size > MAX_IMAGE_BYTES:
+                        raise FeishuClientError(f"Image is larger than {MAX_IMAGE_BYTES} bytes")
+                    chunks.append(chunk)
+                return b"".join(chunks)
         except Exception as e:
             logger.error(f"[Feishu] Failed to download image: {e}")
             raise FeishuClientError(f"Failed to download image: {e}")
+
+    async def send_image_data(self, target: str, image_data: bytes) -> None:
+        """
+        Upload image bytes to Feishu and send them as an image message.
         
-        # 2. Upload image to Feishu
-        upload_url = "https://open.feishu.cn/open-apis/im/v1/images"
+        Args:
+            target: Target user or group ID
+            image_data: Raw image bytes
+        """
+        access_token = await self._get_access_token()
+        
+        # 1. Upload image to Feishu
+        upload_url = f"{self.domain}/open-apis/im/v1/images"
         headers = {"Authorization": f"Bearer {access_token}"}
         
         form_data = aiohttp.FormData()
@@ -223,21 +351,21 @@ class FeishuClient:
         form_data.add_field("image", image_data, filename="image.jpg", content_type="image/jpeg")
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(upload_url, headers=headers, data=form_data, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    result = await response.json()
+            session = self._get_session()
+            async with session.post(upload_url, headers=headers, data=form_data, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                result = await response.json()
                     
-                    if result.get("code") != 0:
-                        raise FeishuClientError(f"Upload image failed: {result.get('msg')}")
+                if result.get("code") != 0:
+                    raise FeishuClientError(f"Upload image failed: {result.get('msg')}")
                     
-                    image_key = result.get("data", {}).get("image_key")
-                    if not image_key:
-                        raise FeishuClientError("No image_key in response")
+                image_key = result.get("data", {}).get("image_key")
+                if not image_key:
+                    raise FeishuClientError("No image_key in response")
         except Exception as e:
             logger.error(f"[Feishu] Failed to upload image: {e}")
             raise
         
-        # 3. Send image message
+        # 2. Send image message
         headers = {
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json",
@@ -245,7 +373,7 @@ class FeishuClient:
         
         receive_id_type = "chat_id" if target.startswith("oc_") else "open_id"
         
-        url = "https://open.feishu.cn/open-apis/im/v1/messages"
+        url = f"{self.domain}/open-apis/im/v1/messages"
         params = {"receive_id_type": receive_id_type}
         
         data = {
@@ -255,15 +383,15 @@ class FeishuClient:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, params=params, json=data, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    result = await response.json()
+            session = self._get_session()
+            async with session.post(url, headers=headers, params=params, json=data, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                result = await response.json()
                     
-                    if result.get("code") == 0:
-                        logger.info(f"[Feishu] Image sent successfully to {target}")
-                    else:
-                        logger.error(f"[Feishu] Failed to send image: {result.get('msg')}")
-                        raise FeishuClientError(f"Send image failed: {result.get('msg')}")
+                if result.get("code") == 0:
+                    logger.info(f"[Feishu] Image sent successfully to {target}")
+                else:
+                    logger.error(f"[Feishu] Failed to send image: {result.get('msg')}")
+                    raise FeishuClientError(f"Send image failed: {result.get('msg')}")
         except Exception as e:
             logger.error(f"[Feishu] Error sending image message: {e}")
             raise
@@ -274,8 +402,15 @@ class FeishuClient:
         if self._access_token and time.time() < self._token_expires_at:
             return self._access_token
         
+        # Concurrent callers share a single refresh
+        async with self._token_lock:
+            if self._access_token and time.time() < self._token_expires_at:
+                return self._access_token
+            return await self._refresh_access_token()
+
+    async def _refresh_access_token(self) -> str:
         # Fetch new token
-        url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal/"
+        url = f"{self.domain}/open-apis/auth/v3/tenant_access_token/internal/"
         headers = {"Content-Type": "application/json"}
         data = {
             "app_id": self.app_id,
@@ -283,19 +418,19 @@ class FeishuClient:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    result = await response.json()
+            session = self._get_session()
+            async with session.post(url, headers=headers, json=data, timeout=aiohttp.ClientTimeout(total=10)) as response:
+                result = await response.json()
                     
-                    if result.get("code") != 0:
-                        raise FeishuClientError(f"Get access token failed: {result.get('msg')}")
+                if result.get("code") != 0:
+                    raise FeishuClientError(f"Get access token failed: {result.get('msg')}")
                     
-                    self._access_token = result.get("tenant_access_token")
-                    expires_in = result.get("expire", 7200)
-                    self._token_expires_at = time.time() + expires_in - 300  # Refresh 5 minutes early
+                self._access_token = result.get("tenant_access_token")
+                expires_in = result.get("expire", 7200)
+                self._token_expires_at = time.time() + expires_in - 300  # Refresh 5 minutes early
                     
-                    logger.info("[Feishu] Access token refreshed successfully")
-                    return self._access_token
+                logger.info("[Feishu] Access token refreshed successfully")
+                return self._access_token
         except Exception as e:
             logger.error(f"[Feishu] Failed to get access token: {e}")
             raise FeishuClientError(f"Failed to get access token: {e}")
@@ -0,0 +1,178 @@
+"""Local stand-in for the Feishu open platform, for development and benchmarks.
+
+Serves just enough of the API for the gateway to run against it:
+
+- ``POST /callback/ws/endpoint`` and ``GET /ws`` for the long connection
+- ``POST /open-apis/auth/v3/tenant_access_token/internal/`` and
+  ``POST /open-apis/im/v1/messages`` for sending
+- ``POST /inject`` pushes an event (JSON body) to every connected gateway
+  over the long connection and returns the ack round-trip time
+- ``POST /inject_webhook?url=...`` posts the same event to a webhook URL,
+  so both receive paths can be timed from one place
+
+Usage::
+
+    python -m gateway.feishu_stub --port 9099
+    FEISHU_DOMAIN=http://127.0.0.1:9099 FEISHU_EVENT_MODE=long_connection python app.py
+
+Injected events carry the verification token ``stub``; set
+``FEISHU_VERIFICATION_TOKEN=stub`` when timing the webhook path.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Any, Dict
+
+from aiohttp import WSMsgType, web
+
+from .feishu_ws import ENDPOINT_PATH, FRAME_CONTROL, FRAME_DATA, Frame
+
+logger = logging.getLogger(__name__)
+
+STUB_SERVICE_ID = 1
+
+
+def build_event(text: str = "ping", chat_type: str = "p2p") -> Dict[str, Any]:
+    """Build a minimal ``im.message.receive_v1`` event."""
+    now_ms = str(int(time.time() * 1000))
+    return {
+        "schema": "2.0",
+        "header": {
+            "event_id": uuid.uuid4().hex,
+            "event_type": "im.message.receive_v1",
+            "create_time": now_ms,
+            "token": "stub",
+            "app_id": "cli_stub",
+        },
+        "event": {
+            "sender": {"sender_id": {"open_id": "ou_stub"}},
+            "message": {
+                "message_id": f"om_{uuid.uuid4().hex}",
+                "message_type": "text",
+                "chat_type": chat_type,
+                "chat_id": "oc_stub",
+                "create_time": now_ms,
+                "content": json.dumps({"text": text}),
+            },
+        },
+    }
+
+
+class FeishuStub:
+    """In-process fake of the Feishu endpoints the gateway talks to."""
+
+    def __init__(self) -> None:
+        self._clients: set[web.WebSocketResponse] = set()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.sent_messages: list[Dict[str, Any]] = []
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(ENDPOINT_PATH, self._endpoint)
+        app.router.add_get("/ws", self._ws)
+        app.router.add_post("/open-apis/auth/v3/tenant_access_token/internal/", self._token)
+        app.router.add_post("/open-apis/im/v1/messages", self._messages)
+        app.router.add_post("/inject", self._inject)
+        app.router.add_post("/inject_webhook", self._inject_webhook)
+        return app
+
+    async def _endpoint(self, request: web.Request) -> web.Response:
+        ws_url = f"ws://{request.host}/ws?device_id=stub&service_id={STUB_SERVICE_ID}"
+        return web.json_response({
+            "code": 0,
+            "data": {
+                "URL": ws_url,
+                "ClientConfig": {"PingInterval": 30, "ReconnectInterval": 1, "ReconnectNonce": 0},
+            },
+        })
+
+    async def _ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self._clients.add(ws)
+        logger.info("[Stub] Gateway connected")
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.BINARY:
+                    continue
+                frame = Frame.decode(msg.data)
+                if frame.method == FRAME_CONTROL and frame.headers.get("type") == "ping":
+                    pong = Frame(service=frame.service, method=FRAME_CONTROL, headers={"type": "pong"})
+                    await ws.send_bytes(pong.encode())
+                elif frame.method == FRAME_DATA:
+                    future = self._pending.pop(frame.headers.get("message_id", ""), None)
+                    if future and not future.done():
+                        future.set_result(json.loads(frame.payload or b"{}"))
+        finally:
+            self._clients.discard(ws)
+            logger.info("[Stub] Gateway disconnected")
+        return ws
+
+    async def _token(self, request: web.Request) -> web.Response:
+        return web.json_response({"code": 0, "tenant_access_token": "t-stub", "expire": 7200})
+
+    async def _messages(self, request: web.Request) -> web.Response:
+        self.sent_messages.append(await request.json())
+        return web.json_response({"code": 0, "data": {"message_id": f"om_{uuid.uuid4().hex}"}})
+
+    async def _inject(self, request: web.Request) -> web.Response:
+        event = await request.json() if request.can_read_body else build_event()
+        if not self._clients:
+            return web.json_response({"error": "no gateway connected"}, status=503)
+
+        started = time.perf_counter()
+        message_ids = []
+        waiters = []
+        try:
+            for ws in list(self._clients):
+                message_id = uuid.uuid4().hex
+                future = asyncio.get_running_loop().create_future()
+                self._pending[message_id] = future
+                message_ids.append(message_id)
+                waiters.append(future)
+                frame = Frame(
+                    service=STUB_SERVICE_ID,
+                    method=FRAME_DATA,
+                    headers={"type": "event", "message_id": message_id, "sum": "1", "seq": "0"},
+                    payload=json.dumps(event).encode(),
+                )
+                await ws.send_bytes(frame.encode())
+
+            acks = await asyncio.wait_for(asyncio.gather(*waiters), timeout=10)
+        except asyncio.TimeoutError:
+            return web.json_response({"error": "ack timeout"}, status=504)
+        finally:
+            # Drop waiters for acks that never came
+            for message_id in message_ids:
+                self._pending.pop(message_id, None)
+        return web.json_response({"acks": acks, "rtt_ms": (time.perf_counter() - started) * 1000})
+
+    async def _inject_webhook(self, request: web.Request) -> web.Response:
+        import aiohttp
+
+        event = await request.json() if request.can_read_body else build_event()
+        started = time.perf_counter()
+        async with aiohttp.ClientSession() as session:
+            async with session.post(request.query["url"], json=event) as response:
+                result = await response.json()
+        return web.json_response({"result": result, "rtt_ms": (time.perf_counter() - started) * 1000})
+
+
+def main() -> None:  # pragma: no cover - manual tool
+    parser = argparse.ArgumentParser(description="Local Feishu stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9099)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s] %(levelname)s - %(name)s: %(message)s")
+    web.run_app(FeishuStub().make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
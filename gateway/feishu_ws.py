@@ -0,0 +1,326 @@
+"""Feishu long-connection (persistent WebSocket) event receiver.
+
+Instead of exposing a public webhook, the gateway dials out to Feishu and
+receives events over a single WebSocket. Frames use Feishu's small protobuf
+envelope (``pbbp2.Frame``), which is encoded/decoded by hand here to avoid
+pulling in the full SDK.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DOMAIN = "https://open.feishu.cn"
+ENDPOINT_PATH = "/callback/ws/endpoint"
+
+# Frame.method values
+FRAME_CONTROL = 0
+FRAME_DATA = 1
+
+MAX_BACKOFF = 60.0
+
+
+class FeishuLongConnectionError(Exception):
+    """Raised when the long-connection endpoint cannot be obtained."""
+
+
+# --- Minimal protobuf codec for pbbp2.Frame ---------------------------------
+
+def _encode_varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _decode_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _varint_field(number: int, value: int) -> bytes:
+    return _encode_varint(number << 3) + _encode_varint(value)
+
+
+def _bytes_field(number: int, data: bytes) -> bytes:
+    return _encode_varint(number << 3 | 2) + _encode_varint(len(data)) + data
+
+
+def _iter_fields(buf: bytes):
+    pos = 0
+    while pos < len(buf):
+        tag, pos = _decode_varint(buf, pos)
+        number, wire_type = tag >> 3, tag & 0x07
+        if wire_type == 0:
+            value, pos = _decode_varint(buf, pos)
+        elif wire_type == 2:
+            length, pos = _decode_varint(buf, pos)
+            value, pos = buf[pos:pos + length], pos + length
+        elif wire_type == 1:
+            value, pos = buf[pos:pos + 8], pos + 8
+        elif wire_type == 5:
+            value, pos = buf[pos:pos + 4], pos + 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type: {wire_type}")
+        yield number, value
+
+
+@dataclass
+class Frame:
+    """A single long-connection frame."""
+
+    seq_id: int = 0
+    log_id: int = 0
+    service: int = 0
+    method: int = FRAME_CONTROL
+    headers: Dict[str, str] = field(default_factory=dict)
+    payload: bytes = b""
+
+    def encode(self) -> bytes:
+        parts = [
+            _varint_field(1, self.seq_id),
+            _varint_field(2, self.log_id),
+            _varint_field(3, self.service),
+            _varint_field(4, self.method),
+        ]
+        for key, value in self.headers.items():
+            header = _bytes_field(1, key.encode()) + _bytes_field(2, value.encode())
+            parts.append(_bytes_field(5, header))
+        if self.payload:
+            parts.append(_bytes_field(8, self.payload))
+        return b"".join(parts)
+
+    @classmethod
+    def decode(cls, data: bytes) -> "Frame":
+        frame = cls()
+        for number, value in _iter_fields(data):
+            if number == 1:
+                frame.seq_id = value
+            elif number == 2:
+                frame.log_id = value
+            elif number == 3:
+                frame.service = value
+            elif number == 4:
+                frame.method = value
+            elif number == 5:
+                header = dict(_iter_fields(value))
+                frame.headers[header.get(1, b"").decode()] = header.get(2, b"").decode()
+            elif number == 8:
+                frame.payload = bytes(value)
+        return frame
+
+
+# --- Receiver ----------------------------------------------------------------
+
+class FeishuLongConnection:
+    """Keeps a persistent event connection to Feishu open, reconnecting as needed."""
+
+    def __init__(
+        self,
+        app_id: str,
+        app_secret: str,
+        on_event: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any] | None]],
+        domain: str = DEFAULT_DOMAIN,
+        session: aiohttp.ClientSession | None = None,
+    ) -> None:
+        """
+        Initialize the receiver.
+
+        Args:
+            app_id: Feishu application ID
+            app_secret: Feishu application secret
+            on_event: Coroutine called with each decoded event payload; a result
+                with ``"success": False`` is acked as failed
+            domain: Open platform base URL (override for a local stand-in server)
+            session: HTTP session to reuse (a private one is created if omitted)
+        """
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.domain = domain.rstrip("/")
+        self._on_event = on_event
+        self._session = session
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self._connected = asyncio.Event()
+        self._fragments: Dict[str, List[bytes | None]] = {}
+
+        # Defaults until the server sends its ClientConfig
+        self._ping_interval = 120.0
+        self._reconnect_interval = 2.0
+        self._reconnect_nonce = 5.0
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def start(self) -> None:
+        if self._task:
+            return
+        self._closing = False
+        self._task = asyncio.create_task(self._run(), name="FeishuLongConnection")
+
+    async def stop(self) -> None:
+        self._closing = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._connected.clear()
+
+    async def wait_connected(self, timeout: float | None = None) -> bool:
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _run(self) -> None:
+        if self._session is not None:
+            await self._run_with(self._session)
+            return
+        async with aiohttp.ClientSession() as session:
+            await self._run_with(session)
+
+    async def _run_with(self, session: aiohttp.ClientSession) -> None:
+        attempt = 0
+        while not self._closing:
+            try:
+                url, service_id = await self._fetch_endpoint(session)
+                async with session.ws_connect(url, max_msg_size=0) as ws:
+                    attempt = 0
+                    self._connected.set()
+                    logger.info("[Feishu] Long connection established")
+                    await self._serve(ws, service_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[Feishu] Long connection error: {e}")
+            finally:
+                self._connected.clear()
+                self._fragments.clear()
+
+            if self._closing:
+                break
+            delay = min(self._reconnect_interval * (2 ** attempt), MAX_BACKOFF)
+            delay += random.uniform(0, self._reconnect_nonce)
+            attempt += 1
+            logger.info(f"[Feishu] Reconnecting long connection in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _fetch_endpoint(self, session: aiohttp.ClientSession) -> Tuple[str, int]:
+        """Exchange app credentials for a WebSocket URL."""
+        url = f"{self.domain}{ENDPOINT_PATH}"
+        data = {"AppID": self.app_id, "AppSecret": self.app_secret}
+        async with session.post(url, json=data, headers={"locale": "zh"}, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            result = await response.json()
+
+        if result.get("code") != 0:
+            raise FeishuLongConnectionError(f"Get endpoint failed: {result.get('msg')}")
+
+        endpoint = result.get("data", {})
+        self._apply_client_config(endpoint.get("ClientConfig") or {})
+        ws_url = endpoint.get("URL")
+        if not ws_url:
+            raise FeishuLongConnectionError("No URL in endpoint response")
+        service_id = int(parse_qs(urlparse(ws_url).query).get("service_id", ["0"])[0])
+        return ws_url, service_id
+
+    def _apply_client_config(self, config: Dict[str, Any]) -> None:
+        if config.get("PingInterval"):
+            self._ping_interval = float(config["PingInterval"])
+        if config.get("ReconnectInterval"):
+            self._reconnect_interval = float(config["ReconnectInterval"])
+        if config.get("ReconnectNonce") is not None:
+            self._reconnect_nonce = float(config["ReconnectNonce"])
+
+    async def _serve(self, ws: aiohttp.ClientWebSocketResponse, service_id: int) -> None:
+        ping_task = asyncio.create_task(self._ping_loop(ws, service_id))
+        try:
+            while True:
+                # Missing several heartbeats in a row means the link is dead
+                msg = await ws.receive(timeout=self._ping_interval * 3)
+                if msg.type == aiohttp.WSMsgType.BINARY:
+                    await self._handle_frame(ws, Frame.decode(msg.data))
+                elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    logger.warning("[Feishu] Long connection closed by server")
+                    return
+        finally:
+            ping_task.cancel()
+
+    async def _ping_loop(self, ws: aiohttp.ClientWebSocketResponse, service_id: int) -> None:
+        while not ws.closed:
+            frame = Frame(service=service_id, method=FRAME_CONTROL, headers={"type": "ping"})
+            try:
+                await ws.send_bytes(frame.encode())
+            except ConnectionError:
+                # The receive loop notices the dead link via its timeout
+                return
+            await asyncio.sleep(self._ping_interval)
+
+    async def _handle_frame(self, ws: aiohttp.ClientWebSocketResponse, frame: Frame) -> None:
+        frame_type = frame.headers.get("type")
+
+        if frame.method == FRAME_CONTROL:
+            if frame_type == "pong" and frame.payload:
+                self._apply_client_config(json.loads(frame.payload))
+            return
+
+        if frame_type != "event":
+            logger.debug(f"[Feishu] Ignoring long connection frame type: {frame_type}")
+            return
+
+        payload = self._reassemble(frame)
+        if payload is None:
+            return
+
+        started = time.perf_counter()
+        try:
+            result = await self._on_event(json.loads(payload))
+            code = 500 if result and result.get("success") is False else 200
+        except Exception as e:
+            logger.error(f"[Feishu] Error handling long connection event: {e}", exc_info=True)
+            code = 500
+
+        # Ack by echoing the frame back with a response payload
+        frame.headers["biz_rt"] = str(int((time.perf_counter() - started) * 1000))
+        frame.payload = json.dumps({"code": code}).encode()
+        await ws.send_bytes(frame.encode())
+
+    def _reassemble(self, frame: Frame) -> bytes | None:
+        """Join fragmented payloads; returns None until all parts arrived."""
+        total = int(frame.headers.get("sum", "1") or 1)
+        if total <= 1:
+            return frame.payload
+
+        message_id = frame.headers.get("message_id", "")
+        parts = self._fragments.setdefault(message_id, [None] * total)
+        parts[int(frame.headers.get("seq", "0"))] = frame.payload
+        if any(part is None for part in parts):
+            return None
+        del self._fragments[message_id]
+        return b"".join(parts)
@@ -0,0 +1,127 @@
+"""WebSocket frame formats negotiated per ``/ws`` client via subprotocols.
+
+Supported subprotocols (the first one in the client's list that the server
+supports is used):
+
+- ``msgpack.zstd`` - msgpack, zstd compressed (needs ``msgpack`` and ``zstandard``)
+- ``msgpack`` - msgpack binary frames (needs ``msgpack``)
+- ``json.deflate`` - JSON, zlib compressed binary frames
+- ``json`` - JSON text frames (default when nothing is negotiated)
+
+Each published event is encoded at most once per format and the encoded
+frame is shared by every subscriber using that format.
+
+Run ``python -m gateway.frames`` to compare size and encode time per format.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+@dataclass(frozen=True)
+class FrameFormat:
+    """How an event is serialized onto the wire."""
+
+    name: str
+    binary: bool
+    encode: Callable[[Dict[str, Any]], bytes | str]
+
+
+def _encode_json(event: Dict[str, Any]) -> str:
+    # Same output as Starlette's WebSocket.send_json
+    return json.dumps(event, separators=(",", ":"), ensure_ascii=False)
+
+
+def _build_formats() -> Dict[str, FrameFormat]:
+    formats: Dict[str, FrameFormat] = {}
+    if msgpack is not None and zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=3)
+        formats["msgpack.zstd"] = FrameFormat(
+            "msgpack.zstd", True, lambda event: compressor.compress(msgpack.packb(event))
+        )
+    if msgpack is not None:
+        formats["msgpack"] = FrameFormat("msgpack", True, msgpack.packb)
+    formats["json.deflate"] = FrameFormat(
+        "json.deflate", True, lambda event: zlib.compress(_encode_json(event).encode(), 6)
+    )
+    formats["json"] = FrameFormat("json", False, _encode_json)
+    return formats
+
+
+FORMATS = _build_formats()
+DEFAULT_FORMAT = FORMATS["json"]
+
+
+def negotiate(requested: Iterable[str]) -> FrameFormat | None:
+    """Pick the first supported subprotocol the client asked for, or None."""
+    for name in requested:
+        frame_format = FORMATS.get(name.strip())
+        if frame_format is not None:
+            return frame_format
+    return None
+
+
+class EncodedEvent:
+    """A published event that caches its encoding per frame format."""
+
+    __slots__ = ("event", "_frames")
+
+    def __init__(self, event: Dict[str, Any]) -> None:
+        self.event = event
+        self._frames: Dict[str, bytes | str] = {}
+
+    def encode(self, frame_format: FrameFormat) -> bytes | str:
+        frame = self._frames.get(frame_format.name)
+        if frame is None:
+            frame = frame_format.encode(self.event)
+            self._frames[frame_format.name] = frame
+        return frame
+
+
+def main() -> None:  # pragma: no cover - manual benchmark
+    import time
+
+    from .events import IncomingMessageEvent
+
+    event = IncomingMessageEvent(
+        msg_id="om_dc13264520392913993dd051dba21dcf",
+        sender="ou_84aad35d084aa403a838cf73ee18467",
+        sender_name="ou_84aad35d084aa403a838cf73ee18467",
+        receiver="cli_a1b2c3d4e5f6g7h8",
+        content="客厅温度 26.5°C，湿度 48%，空调已开启",
+        is_group=True,
+        timestamp=1731000000000,
+        room_id="oc_5ad11d72b830411d72b836c20",
+        room_name="oc_5ad11d72b830411d72b836c20",
+        at_me=True,
+    ).asdict()
+
+    rounds = 20000
+    baseline = len(_encode_json(event).encode())
+    print(f"{'format':<14}{'bytes':>8}{'vs json':>10}{'encode us':>12}")
+    for frame_format in reversed(list(FORMATS.values())):
+        frame = frame_format.encode(event)
+        size = len(frame.encode() if isinstance(frame, str) else frame)
+        started = time.perf_counter()
+        for _ in range(rounds):
+            frame_format.encode(event)
+        elapsed_us = (time.perf_counter() - started) / rounds * 1e6
+        print(f"{frame_format.name:<14}{size:>8}{size / baseline:>10.0%}{elapsed_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Bounded TTL cache that deduplicates send requests by idempotency key."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict
+
+from .admission import OverloadedError
+
+
+@dataclass
+class _Entry:
+    future: asyncio.Future
+    expires_at: float
+
+
+class IdempotencyCache:
+    """Map idempotency keys to an in-flight or completed result.
+
+    Concurrent and repeated calls with the same key share one upstream call
+    and get the same response. Failed calls are not cached, so a retry after
+    an error really retries. Only completed entries are evicted; when the
+    cache is full of in-flight calls, new keys are rejected with
+    OverloadedError rather than risking a duplicate upstream call.
+    """
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 10000) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Insertion ordered; all entries share one TTL, so the oldest expire first
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._hits = 0
+        self._inflight_hits = 0
+        self._misses = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Return the cached result for ``key`` or run ``factory`` once to produce it."""
+        now = time.monotonic()
+        self._expire(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.future.done():
+                self._hits += 1
+            else:
+                self._inflight_hits += 1
+            # Shield so one waiter disconnecting does not cancel the shared call
+            return await asyncio.shield(entry.future)
+
+        if len(self._entries) >= self.max_entries:
+            self._evict(len(self._entries) - self.max_entries + 1)
+            if len(self._entries) >= self.max_entries:
+                raise OverloadedError("Too many in-flight idempotent requests, retry later", 1)
+
+        self._misses += 1
+        # The call runs in its own task, so cancelling any caller (even the first)
+        # neither cancels the send nor drops the key while it may still reach Feishu
+        future = asyncio.ensure_future(factory())
+        entry = _Entry(future, now + self.ttl)
+        self._entries[key] = entry
+        future.add_done_callback(functools.partial(self._finished, key, entry))
+        return await asyncio.shield(future)
+
+    def _finished(self, key: str, entry: _Entry, future: asyncio.Future) -> None:
+        # Failed calls are not cached; exception() also marks the error as retrieved
+        if future.cancelled() or future.exception() is not None:
+            if self._entries.get(key) is entry:
+                del self._entries[key]
+
+    def _expire(self, now: float) -> None:
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if oldest.expires_at > now or not oldest.future.done():
+                break
+            self._entries.popitem(last=False)
+
+    def _evict(self, count: int) -> None:
+        """Drop up to ``count`` of the oldest completed entries, keeping in-flight ones."""
+        stale = []
+        for key, entry in self._entries.items():
+            if entry.future.done():
+                stale.append(key)
+                if len(stale) == count:
+                    break
+        for key in stale:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._inflight_hits + self._misses
+        return {
+            "size": len(self._entries),
+            "hits": self._hits,
+            "inflight_hits": self._inflight_hits,
+            "misses": self._misses,
+            "hit_rate": round((self._hits + self._inflight_hits) / lookups, 4) if lookups else 0.0,
+        }
@@ -3,25 +3,87 @@
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
-from typing import Any, Dict, Union
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict
 
+from .admission import AdaptiveLimiter, OverloadedError
 from .broker import MessageBroker
-from .config import GatewayConfig
+from .coalescer import SendCoalescer
+from .config import ChannelConfig, GatewayConfig
 from .events import IncomingMessageEvent, OutgoingMessageRequest
+from .frames import EncodedEvent
+from .idempotency import IdempotencyCache
+from .scheduler import SendScheduler
+from .tracing import Tracer
 
 logger = logging.getLogger(__name__)
 
+# Request fields that control delivery rather than describe the message
+_DELIVERY_FIELDS = ("send_at", "delay", "idempotency_key", "priority")
+
+# How far ahead a send may be scheduled (seconds)
+_MAX_SCHEDULE_AHEAD = 366 * 24 * 3600
+
 
 class GatewayManager:
-    """Coordinates the WeChat/Feishu client and exposes async helpers for the API layer."""
+    """Coordinates the WeChat/Feishu channel clients and exposes async helpers for the API layer.
+    
+    One process can host several named channels (e.g. two Feishu apps and a
+    WeChat account). They share the broker, the HTTP connection pool and the
+    send pipeline; sends are routed by the ``channel`` field, defaulting to
+    the first configured channel.
+    """
 
     def __init__(self, config: GatewayConfig | None = None) -> None:
         self.config = config or GatewayConfig.load()
         self._loop: asyncio.AbstractEventLoop | None = None
         self._broker = MessageBroker()
-        self._client: Union[Any, None] = None  # Can be WeChatClient or FeishuClient
-        self.channel_type = self.config.channel_type
+        self._channels: Dict[str, ChannelConfig] = {
+            channel.name: channel for channel in self.config.channel_configs()
+        }
+        self.default_channel = next(iter(self._channels))
+        self._clients: Dict[str, Any] = {}  # Channel name -> WeChatClient or FeishuClient
+        self._session: Any = None  # aiohttp.ClientSession shared by Feishu channels
+        self.channel_type = self._channels[self.default_channel].channel_type
+        self._created_at = time.monotonic()
+        self._ready_at: float | None = None
+        self._first_send_at: float | None = None
+        self._warm_tasks: list[asyncio.Task] = []
+        self._idempotency = IdempotencyCache(
+            ttl=self.config.idempotency_ttl,
+            max_entries=self.config.idempotency_max_keys,
+        )
+        self._coalescer: SendCoalescer | None = None
+        if self.config.coalesce_window_ms > 0:
+            self._coalescer = SendCoalescer(
+                self._dispatch_text,
+                window=self.config.coalesce_window_ms / 1000,
+                max_chars=self.config.coalesce_max_chars,
+            )
+        # Per channel, so a slow upstream (e.g. WeChat) does not shrink the limit of other apps
+        self._limiters = {
+            (channel, endpoint): AdaptiveLimiter(
+                f"{channel}/{endpoint}",
+                initial_limit=self.config.admission_initial_limit,
+                max_limit=self.config.admission_max_limit,
+                target_latency=self.config.admission_target_latency_ms / 1000,
+            )
+            for channel in self._channels
+            for endpoint in ("send_message", "send_image")
+        }
+        self.tracer = Tracer(
+            sample_rate=self.config.trace_sample_rate,
+            capacity=self.config.trace_buffer_size,
+        )
+        self._scheduler = SendScheduler(
+            self._fire_scheduled,
+            store_path=self.config.schedule_store_path,
+            max_pending=self.config.schedule_max_pending,
+        )
 
     async def start(self) -> None:
         if self._loop:
@@ -29,48 +91,171 @@ class GatewayManager:
         self._loop = asyncio.get_running_loop()
         self._broker.attach_loop(self._loop)
         
-        # Initialize client based on channel type
-        if self.config.channel_type == "feishu":
-            await self._start_feishu()
-        elif self.config.channel_type == "wechat":
-            await self._start_wechat()
-        else:
-            raise ValueError(f"Unsupported channel type: {self.config.channel_type}")
+        # Initialize a client per channel based on its type
+        if sum(channel.channel_type == "wechat" for channel in self._channels.values()) > 1:
+            raise ValueError("Only one WeChat channel can run per process")
+        for channel in self._channels.values():
+            if channel.channel_type == "feishu":
+                await self._start_feishu(channel)
+            elif channel.channel_type == "wechat":
+                await self._start_wechat(channel)
+            else:
+                raise ValueError(f"Unsupported channel type: {channel.channel_type}")
         
-        logger.info(f"Gateway manager started with channel: {self.config.channel_type}")
+        # Restore persisted sends now; they start firing only once warm-up succeeds
+        await self._scheduler.restore()
+        
+        channels = ", ".join(f"{name} ({channel.channel_type})" for name, channel in self._channels.items())
+        logger.info(f"Gateway manager started with channels: {channels}")
         logger.info("Message pipeline optimized for low latency")
+        
+        # Warm up each Feishu channel on its own and keep retrying failed ones in the background,
+        # so one app with bad credentials neither blocks nor re-warms the others
+        feishu_channels = [name for name in self._clients if self._channels[name].channel_type == "feishu"]
+        if not feishu_channels:
+            await self._mark_ready()
+        results = await asyncio.gather(*[self._warm_up(name) for name in feishu_channels])
+        for name, ok in zip(feishu_channels, results):
+            if not ok:
+                self._warm_tasks.append(asyncio.create_task(self._warm_up_until_ready(name)))
+
+    async def _warm_up(self, name: str) -> bool:
+        """Prefetch credentials and open upstream connections for one channel. Returns True on success."""
+        try:
+            await self._clients[name].warm_up()
+        except Exception as e:
+            logger.warning(f"Warm-up of channel {name} failed, will retry: {e}")
+            return False
+        
+        logger.info(f"Channel {name} ready in {(time.monotonic() - self._created_at) * 1000:.0f}ms")
+        await self._mark_ready()
+        return True
+
+    async def _warm_up_until_ready(self, name: str) -> None:
+        delay = 1.0
+        while True:
+            await asyncio.sleep(delay)
+            if await self._warm_up(name):
+                return
+            delay = min(delay * 2, 30.0)
 
-    async def _start_feishu(self) -> None:
-        """Initialize Feishu client."""
+    async def _mark_ready(self) -> None:
+        """Mark the process ready once its first channel can send; starts scheduled sends."""
+        if self._ready_at is not None:
+            return
+        self._ready_at = time.monotonic()
+        logger.info(f"Gateway ready in {(self._ready_at - self._created_at) * 1000:.0f}ms")
+        await self._scheduler.start()
+
+    @property
+    def ready(self) -> bool:
+        """True once at least one channel has warmed up and can send immediately.
+        
+        Channels still warming up are reported as not ready in readiness(),
+        but do not take the whole process out of rotation.
+        """
+        if self._ready_at is None:
+            return False
+        return any(self._channel_ready(name) for name in self._clients)
+
+    def _channel_ready(self, name: str) -> bool:
+        if self._channels[name].channel_type == "feishu":
+            return self._clients[name].ready
+        return True
+
+    def readiness(self) -> Dict[str, Any]:
+        """Readiness state plus cold start timings in milliseconds."""
+        def since_created(mark: float | None) -> float | None:
+            return round((mark - self._created_at) * 1000, 1) if mark is not None else None
+        
+        return {
+            "ready": self.ready,
+            "channels": {name: self._channel_ready(name) for name in self._clients},
+            "cold_start_ms": since_created(self._ready_at),
+            "first_send_ms": since_created(self._first_send_at),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Runtime counters for the /stats endpoint."""
+        stats: Dict[str, Any] = {
+            "channels": {name: channel.channel_type for name, channel in self._channels.items()},
+            "idempotency": self._idempotency.stats(),
+            "scheduler": self._scheduler.stats(),
+            "admission": {
+                name: {endpoint: self._limiters[(name, endpoint)].stats() for endpoint in ("send_message", "send_image")}
+                for name in self._channels
+            },
+        }
+        if self._coalescer:
+            stats["coalescing"] = self._coalescer.stats()
+        return stats
+
+    def _record_send(self) -> None:
+        if self._first_send_at is None:
+            self._first_send_at = time.monotonic()
+            logger.info(f"Cold start to first send: {(self._first_send_at - self._created_at) * 1000:.0f}ms")
+
+    async def _start_feishu(self, channel: ChannelConfig) -> None:
+        """Initialize a Feishu client for one channel."""
+        import aiohttp
+        
         from .feishu_client import FeishuClient
         
-        if not self.config.feishu_app_id or not self.config.feishu_app_secret:
-            raise ValueError("Feishu app_id and app_secret are required")
-        if not self.config.feishu_verification_token:
-            raise ValueError("Feishu verification_token is required")
+        if not channel.feishu_app_id or not channel.feishu_app_secret:
+            raise ValueError(f"Feishu app_id and app_secret are required for channel {channel.name}")
+        if channel.feishu_event_mode not in ("webhook", "long_connection"):
+            raise ValueError(f"Unsupported Feishu event mode: {channel.feishu_event_mode}")
+        if channel.feishu_event_mode == "webhook" and not channel.feishu_verification_token:
+            raise ValueError(f"Feishu verification_token is required for channel {channel.name}")
         
-        self._client = FeishuClient(
-            app_id=self.config.feishu_app_id,
-            app_secret=self.config.feishu_app_secret,
-            verification_token=self.config.feishu_verification_token,
-            on_message=self._handle_incoming,
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        
+        client = FeishuClient(
+            app_id=channel.feishu_app_id,
+            app_secret=channel.feishu_app_secret,
+            verification_token=channel.feishu_verification_token or "",
+            on_message=functools.partial(self._handle_incoming, channel.name),
+            event_mode=channel.feishu_event_mode,
+            domain=channel.feishu_domain,
+            session=self._session,
+            tracer=self.tracer,
         )
-        logger.info("[Feishu] Client initialized")
+        self._clients[channel.name] = client
+        await client.start()
+        logger.info(f"[Feishu] Client initialized for channel {channel.name} ({channel.feishu_event_mode} mode)")
 
-    async def _start_wechat(self) -> None:
-        """Initialize WeChat client."""
+    async def _start_wechat(self, channel: ChannelConfig) -> None:
+        """Initialize the WeChat client for one channel."""
         from .wechat_client import WeChatClient
         
-        self._client = WeChatClient(on_message=self._handle_incoming)
-        await asyncio.to_thread(self._client.start)
-        logger.info("[WeChat] Client initialized")
+        client = WeChatClient(on_message=functools.partial(self._handle_incoming, channel.name))
+        await asyncio.to_thread(client.start)
+        self._clients[channel.name] = client
+        logger.info(f"[WeChat] Client initialized for channel {channel.name}")
 
     async def stop(self) -> None:
-        if not self._client:
+        for task in self._warm_tasks:
+            task.cancel()
+        self._warm_tasks.clear()
+        
+        if not self._clients:
             return
         
-        if self.config.channel_type == "wechat":
-            await asyncio.to_thread(self._client.stop)
+        await self._scheduler.stop()
+        if self._coalescer:
+            await self._coalescer.close()
+        
+        for name, client in self._clients.items():
+            if self._channels[name].channel_type == "wechat":
+                await asyncio.to_thread(client.stop)
+            else:
+                await client.stop()
+        self._clients.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
         
         logger.info("Gateway manager stopped")
 
@@ -80,59 +265,214 @@ class GatewayManager:
     async def unregister_listener(self, queue: asyncio.Queue) -> None:
         await self._broker.unsubscribe(queue)
 
-    def _handle_incoming(self, event: IncomingMessageEvent) -> None:
+    def _handle_incoming(self, channel: str, event: IncomingMessageEvent) -> None:
         """Handle incoming message and publish to subscribers.
         
-        Note: This is called synchronously from the Feishu client.
+        Note: This is called synchronously from the channel client.
         We schedule the async publish as a task to avoid blocking.
         """
+        event.channel = channel
         logger.debug("Incoming message event: %s", event)
         
+        self.tracer.mark(event.trace_id, "callback")
+        
         # Schedule async publish as a task (non-blocking)
         if self._loop:
             asyncio.run_coroutine_threadsafe(
-                self._broker.async_publish(event.asdict()), 
+                self._publish(event), 
                 self._loop
             )
 
-    async def send_text(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        if not self._client:
-            raise RuntimeError("Gateway client not started")
+    async def _publish(self, event: IncomingMessageEvent) -> None:
+        # Subscribers share one EncodedEvent, so each wire format is serialized once
+        await self._broker.async_publish(EncodedEvent(event.asdict()))
+        self.tracer.mark(event.trace_id, "published")
+
+    async def send_text(
+        self,
+        payload: Dict[str, Any],
+        idempotency_key: str | None = None,
+        urgent: bool = False,
+    ) -> Dict[str, Any]:
+        """Send text message; requests sharing an idempotency key are sent once.
+        
+        Raises OverloadedError when the endpoint is at its concurrency limit.
+        """
+        send = functools.partial(self._send_text, payload, urgent)
+        if idempotency_key:
+            # Scoped by channel: apps (and the HA instances behind them) pick keys independently
+            channel = self._resolve_channel(payload)
+            return await self._idempotency.run(f"send_text:{channel}:{idempotency_key}", send)
+        return await send()
+
+    async def _send_text(self, payload: Dict[str, Any], urgent: bool = False) -> Dict[str, Any]:
+        channel = self._resolve_channel(payload)
+        
+        due = self._due_time(payload)
+        if due is not None:
+            return self._schedule("text", payload, due)
         
         request = OutgoingMessageRequest(
             target=payload["target"],
             content=payload["content"],
             at_list=payload.get("at_list"),
+            channel=channel,
         )
         
-        if self.config.channel_type == "feishu":
-            await self._client.send_text(request)
-        elif self.config.channel_type == "wechat":
-            await asyncio.to_thread(self._client.send_text, request)
+        if self._coalescer:
+            return await self._coalescer.submit(request, urgent)
         
+        await self._dispatch_text(request, urgent)
         return {"status": "sent"}
+
+    async def _dispatch_text(self, request: OutgoingMessageRequest, urgent: bool = False) -> None:
+        """Hand a text message to the channel client (one upstream API call).
+        
+        The admission slot covers only this call, so texts lingering in the
+        coalescer or waiting in the scheduler do not use up concurrency.
+        """
+        channel = request.channel or self.default_channel
+        client = self._clients[channel]
+        limiter = self._limiters[(channel, "send_message")]
+        with limiter.admit(urgent):
+            started = time.monotonic()
+            ok = False
+            try:
+                if self._channels[channel].channel_type == "feishu":
+                    await client.send_text(request)
+                else:
+                    await asyncio.to_thread(client.send_text, request)
+                ok = True
+            finally:
+                limiter.observe(time.monotonic() - started, ok)
+        
+        self._record_send()
     
-    async def send_image(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """Send image message."""
-        if not self._client:
-            raise RuntimeError("Gateway client not started")
+    async def send_image(
+        self,
+        payload: Dict[str, Any],
+        idempotency_key: str | None = None,
+        urgent: bool = False,
+    ) -> Dict[str, Any]:
+        """Send image message; requests sharing an idempotency key are sent once.
+        
+        Raises OverloadedError when the endpoint is at its concurrency limit.
+        """
+        send = functools.partial(self._send_image, payload, urgent)
+        if idempotency_key:
+            # Scoped by channel: apps (and the HA instances behind them) pick keys independently
+            channel = self._resolve_channel(payload)
+            return await self._idempotency.run(f"send_image:{channel}:{idempotency_key}", send)
+        return await send()
+
+    async def _send_image(self, payload: Dict[str, Any], urgent: bool = False) -> Dict[str, Any]:
+        channel = self._resolve_channel(payload)
+        channel_type = self._channels[channel].channel_type
+        if channel_type != "feishu":
+            raise NotImplementedError(f"Image sending not implemented for {channel_type}")
         
-        target = payload["target"]
-        image_url = payload["image_url"]
+        due = self._due_time(payload)
+        if due is not None:
+            return self._schedule("image", payload, due)
         
-        if self.config.channel_type == "feishu":
-            await self._client.send_image(target, image_url)
-        else:
-            raise NotImplementedError(f"Image sending not implemented for {self.config.channel_type}")
+        # The slot also covers the download, so an overloaded gateway sheds before
+        # fetching anything; only the Feishu calls are timed for the limit
+        client = self._clients[channel]
+        limiter = self._limiters[(channel, "send_image")]
+        with limiter.admit(urgent):
+            image_data = await client.download_image(payload["image_url"])
+            started = time.monotonic()
+            ok = False
+            try:
+                await client.send_image_data(payload["target"], image_data)
+                ok = True
+            finally:
+                limiter.observe(time.monotonic() - started, ok)
         
+        self._record_send()
         return {"status": "sent"}
     
-    async def handle_feishu_webhook(self, event_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle Feishu webhook event."""
-        if self.config.channel_type != "feishu":
-            raise RuntimeError("Feishu webhook can only be handled in feishu channel mode")
+    def _resolve_channel(self, payload: Dict[str, Any]) -> str:
+        """Name of the started channel a send is routed to."""
+        if not self._clients:
+            raise RuntimeError("Gateway client not started")
+        channel = payload.get("channel") or self.default_channel
+        if channel not in self._clients:
+            raise ValueError(f"Unknown channel: {channel}")
+        return channel
+
+    def cancel_scheduled(self, schedule_id: str) -> bool:
+        """Cancel a pending scheduled send. Returns False if unknown or already sent."""
+        return self._scheduler.cancel(schedule_id)
+
+    @staticmethod
+    def _due_time(payload: Dict[str, Any]) -> float | None:
+        """Unix time a send is deferred to, or None to send now."""
+        send_at = payload.get("send_at")
+        delay = payload.get("delay")
+        if send_at is None and delay is None:
+            return None
+        if send_at is not None and delay is not None:
+            raise ValueError("Use either send_at or delay, not both")
+        
+        if delay is not None:
+            if not math.isfinite(delay) or delay < 0:
+                raise ValueError("delay must be a non-negative number of seconds")
+            due = time.time() + delay
+        elif isinstance(send_at, datetime):
+            # Naive datetimes are taken as UTC
+            if send_at.tzinfo is None:
+                send_at = send_at.replace(tzinfo=timezone.utc)
+            due = send_at.timestamp()
+        else:
+            due = float(send_at)
+        
+        now = time.time()
+        if not math.isfinite(due) or due > now + _MAX_SCHEDULE_AHEAD:
+            raise ValueError("Sends can be scheduled at most 366 days ahead")
+        return due if due > now else None
+
+    def _schedule(self, kind: str, payload: Dict[str, Any], due: float) -> Dict[str, Any]:
+        message = {k: v for k, v in payload.items() if k not in _DELIVERY_FIELDS and v is not None}
+        # Build the response first, so nothing can fail once the job is journaled
+        send_at = datetime.fromtimestamp(due, timezone.utc).isoformat()
+        schedule_id = self._scheduler.schedule(kind, message, due)
+        return {"status": "scheduled", "schedule_id": schedule_id, "send_at": send_at}
+
+    async def _fire_scheduled(self, kind: str, payload: Dict[str, Any]) -> None:
+        # Scheduled sends go through admission like any other; when shed, wait and retry
+        while True:
+            try:
+                if kind == "text":
+                    await self._send_text(payload)
+                elif kind == "image":
+                    await self._send_image(payload)
+                else:
+                    logger.error(f"Unknown scheduled send kind: {kind}")
+                return
+            except OverloadedError as e:
+                await asyncio.sleep(e.retry_after)
+    
+    def feishu_webhook_channel(self, channel: str | None = None) -> str | None:
+        """Name of the Feishu channel that receives events by webhook (the first one if omitted).
+        
+        Returns None for unknown channels and for long connection channels,
+        which have no verification token and must not accept webhook posts.
+        """
+        for name, config in self._channels.items():
+            if channel not in (None, name):
+                continue
+            if config.channel_type == "feishu" and config.feishu_event_mode == "webhook":
+                return name
+        return None
+
+    async def handle_feishu_webhook(self, event_data: Dict[str, Any], channel: str | None = None) -> Dict[str, Any]:
+        """Handle Feishu webhook event for a channel (the first webhook channel if omitted)."""
+        name = self.feishu_webhook_channel(channel)
+        if name is None:
+            raise RuntimeError(f"No Feishu webhook channel: {channel or 'default'}")
         
-        if not self._client:
+        if name not in self._clients:
             raise RuntimeError("Gateway client not started")
         
-        return await self._client.handle_webhook(event_data)
+        return await self._clients[name].handle_webhook(event_data)
@@ -0,0 +1,261 @@
+"""Delayed / scheduled sends backed by a single heap-driven timer task."""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerFullError(Exception):
+    """Raised when the pending job limit has been reached."""
+
+
+class _Job:
+    __slots__ = ("job_id", "due", "kind", "payload")
+
+    def __init__(self, job_id: str, due: float, kind: str, payload: Dict[str, Any]) -> None:
+        self.job_id = job_id
+        self.due = due
+        self.kind = kind
+        self.payload = payload
+
+
+class SendScheduler:
+    """Run ``fire(kind, payload)`` at a given wall-clock time.
+
+    Jobs live in a dict (id -> job) plus a min-heap of ``(due, seq, id)``.
+    Insert is a heap push, cancel is an O(1) dict removal; stale heap entries
+    are skipped when they reach the top and the heap is rebuilt once they
+    outnumber live jobs. One task sleeps until the earliest due time.
+
+    With ``store_path`` set, adds and completions are appended to a JSON-lines
+    journal that is replayed (and compacted) on start, so pending jobs survive
+    restarts. Compaction rewrites the file in a worker thread and swaps it in
+    once done, so it never blocks the event loop. Jobs are marked done before
+    they fire: delivery is at most once.
+
+    At most ``max_concurrent`` sends run at a time; due jobs beyond that stay
+    pending (and cancellable) until a slot frees up, so a backlog of overdue
+    jobs after a restart drains at a bounded rate.
+    """
+
+    def __init__(
+        self,
+        fire: Callable[[str, Dict[str, Any]], Awaitable[Any]],
+        store_path: str | None = None,
+        max_pending: int = 100000,
+        max_concurrent: int = 10,
+    ) -> None:
+        self._fire = fire
+        self.store_path = store_path
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._restored = False
+        self._jobs: Dict[str, _Job] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = itertools.count()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._running: Set[asyncio.Task] = set()
+        self._journal = None
+        self._journal_lines = 0
+        self._compaction: asyncio.Task | None = None
+        # Journal lines written while a compaction snapshot is being saved
+        self._compaction_tail: List[str] = []
+        self._scheduled = 0
+        self._cancelled = 0
+        self._fired = 0
+
+    async def restore(self) -> None:
+        """Replay the journal so pending jobs can be listed and cancelled before start()."""
+        if self._restored:
+            return
+        self._restored = True
+        if self.store_path:
+            await self._load()
+            logger.info(f"Scheduler restored {len(self._jobs)} pending sends from {self.store_path}")
+
+    async def start(self) -> None:
+        """Start firing due jobs."""
+        if self._task:
+            return
+        await self.restore()
+        self._task = asyncio.create_task(self._run(), name="SendScheduler")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._compaction:
+            await self._compaction
+        if self._journal:
+            self._journal.close()
+            self._journal = None
+
+    def schedule(self, kind: str, payload: Dict[str, Any], due: float) -> str:
+        """Schedule a send at unix time ``due`` and return its id."""
+        if len(self._jobs) >= self.max_pending:
+            raise SchedulerFullError(f"Too many scheduled sends (limit {self.max_pending})")
+
+        job = _Job(uuid.uuid4().hex[:16], due, kind, payload)
+        self._add(job)
+        self._scheduled += 1
+        self._write({"op": "add", "id": job.job_id, "due": due, "kind": kind, "payload": payload})
+        return job.job_id
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a pending send. Returns False if it is unknown or already fired."""
+        if self._jobs.pop(job_id, None) is None:
+            return False
+        self._cancelled += 1
+        self._write({"op": "done", "id": job_id})
+        if len(self._heap) > 2 * len(self._jobs) + 1024:
+            self._rebuild_heap()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self._jobs),
+            "scheduled": self._scheduled,
+            "cancelled": self._cancelled,
+            "fired": self._fired,
+            "running": len(self._running),
+            "next_due": self._heap[0][0] if self._jobs else None,
+        }
+
+    def _add(self, job: _Job) -> None:
+        self._jobs[job.job_id] = job
+        heapq.heappush(self._heap, (job.due, next(self._seq), job.job_id))
+        if self._heap[0][2] == job.job_id:
+            # New earliest job: let the timer task re-arm
+            self._wake.set()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(job.due, next(self._seq), job.job_id) for job in self._jobs.values()]
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> _Job | None:
+        while self._heap and (self._heap[0][2] not in self._jobs or self._heap[0][0] <= now):
+            _, _, job_id = heapq.heappop(self._heap)
+            job = self._jobs.pop(job_id, None)
+            if job is not None:
+                return job
+            # Otherwise cancelled: skip the stale entry
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            self._wake.clear()
+            # Take a slot before a job, so due jobs stay pending while all slots are busy
+            await self._slots.acquire()
+            job = self._pop_due(time.time())
+            if job is not None:
+                self._write({"op": "done", "id": job.job_id})
+                self._fired += 1
+                task = asyncio.create_task(self._fire_job(job))
+                self._running.add(task)
+                task.add_done_callback(self._job_finished)
+                continue
+            self._slots.release()
+
+            timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _job_finished(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        self._slots.release()
+
+    async def _fire_job(self, job: _Job) -> None:
+        lateness = time.time() - job.due
+        if lateness > 5:
+            logger.warning(f"Scheduled send {job.job_id} fired {lateness:.1f}s late")
+        try:
+            await self._fire(job.kind, job.payload)
+        except Exception as e:
+            logger.error(f"Scheduled send {job.job_id} failed: {e}")
+
+    # --- Persistence ------------------------------------------------------------
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        if not self._journal:
+            return
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+        self._journal.write(line)
+        self._journal_lines += 1
+        if self._compaction:
+            self._compaction_tail.append(line)
+        elif self._journal_lines > 2 * len(self._jobs) + 10000:
+            self._compaction = asyncio.create_task(self._compact())
+
+    async def _load(self) -> None:
+        self._jobs.update(await asyncio.to_thread(self._read_journal, self.store_path))
+        self._rebuild_heap()
+        await self._compact()
+
+    @staticmethod
+    def _read_journal(path: str) -> Dict[str, _Job]:
+        jobs: Dict[str, _Job] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # Torn write from a crash
+                    if record.get("op") == "add":
+                        jobs[record["id"]] = _Job(record["id"], record["due"], record["kind"], record["payload"])
+                    elif record.get("op") == "done":
+                        jobs.pop(record["id"], None)
+        return jobs
+
+    async def _compact(self) -> None:
+        """Rewrite the journal with only the pending jobs.
+
+        The snapshot is written to a temporary file off the event loop while
+        the old journal stays live; lines appended meanwhile are replayed onto
+        the new file before it replaces the old one.
+        """
+        jobs = list(self._jobs.values())
+        self._compaction_tail = []
+        tmp_path = f"{self.store_path}.tmp"
+        try:
+            await asyncio.to_thread(self._write_snapshot, tmp_path, jobs)
+            with open(tmp_path, "a", encoding="utf-8") as f:
+                f.writelines(self._compaction_tail)
+            os.replace(tmp_path, self.store_path)
+        except OSError as e:
+            logger.error(f"Scheduler journal compaction failed: {e}")
+            if not self._journal:
+                self._journal = open(self.store_path, "a", encoding="utf-8", buffering=1)
+            return
+        finally:
+            self._compaction = None
+
+        if self._journal:
+            self._journal.close()
+        self._journal = open(self.store_path, "a", encoding="utf-8", buffering=1)
+        self._journal_lines = len(jobs) + len(self._compaction_tail)
+        self._compaction_tail = []
+
+    @staticmethod
+    def _write_snapshot(path: str, jobs: List[_Job]) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            for job in jobs:
+                record = {"op": "add", "id": job.job_id, "due": job.due, "kind": job.kind, "payload": job.payload}
+                f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
@@ -0,0 +1,104 @@
+"""Sampled per-stage tracing of incoming events, kept in a fixed-size ring buffer."""
+
+from __future__ import annotations
+
+import itertools
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+
+
+class Trace:
+    """Timestamps of one event as it moves through the pipeline."""
+
+    __slots__ = ("trace_id", "started_at", "stages", "meta")
+
+    def __init__(self, trace_id: str) -> None:
+        self.trace_id = trace_id
+        self.started_at = time.time()
+        self.stages: List[Tuple[str, float]] = [("received", time.perf_counter())]
+        self.meta: Dict[str, Any] = {}
+
+    def mark(self, stage: str) -> None:
+        self.stages.append((stage, time.perf_counter()))
+
+    @property
+    def total_ms(self) -> float:
+        return (self.stages[-1][1] - self.stages[0][1]) * 1000
+
+    def asdict(self) -> Dict[str, Any]:
+        origin = previous = self.stages[0][1]
+        stages = []
+        for stage, at in self.stages:
+            stages.append({
+                "stage": stage,
+                "at_ms": round((at - origin) * 1000, 3),
+                "delta_ms": round((at - previous) * 1000, 3),
+            })
+            previous = at
+        return {
+            "trace_id": self.trace_id,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "total_ms": round(self.total_ms, 3),
+            "stages": stages,
+            **self.meta,
+        }
+
+
+class Tracer:
+    """Sample traces and keep the last ``capacity`` of them.
+
+    The buffer is a preallocated list indexed by an ``itertools.count``; the
+    counter's ``next()`` is atomic under the GIL, so recording needs no lock
+    even when events arrive from the WeChat receive thread. With
+    ``sample_rate`` 0 every call returns immediately.
+    """
+
+    def __init__(self, sample_rate: float = 0.0, capacity: int = 256) -> None:
+        if capacity < 1:
+            raise ValueError(f"Trace buffer capacity must be at least 1, got {capacity}")
+        self.sample_rate = sample_rate
+        self.capacity = capacity
+        self._ring: List[Trace | None] = [None] * capacity
+        self._counter = itertools.count()
+        self._by_id: Dict[str, Trace] = {}
+
+    def start(self) -> Trace | None:
+        """Begin a trace for this event if it is sampled."""
+        if self.sample_rate <= 0 or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+            return None
+        return Trace(uuid.uuid4().hex[:16])
+
+    def commit(self, trace: Trace) -> None:
+        """Store a trace in the ring buffer, evicting the oldest one."""
+        slot = next(self._counter) % self.capacity
+        evicted = self._ring[slot]
+        if evicted is not None:
+            self._by_id.pop(evicted.trace_id, None)
+        self._ring[slot] = trace
+        self._by_id[trace.trace_id] = trace
+
+    def mark(self, trace_id: str | None, stage: str, once: bool = False) -> None:
+        """Record a stage for a committed trace, if it is still buffered.
+
+        With ``once``, a stage the trace already has is not recorded again.
+        """
+        if trace_id is None:
+            return
+        trace = self._by_id.get(trace_id)
+        if trace is None:
+            return
+        if once and any(name == stage for name, _ in trace.stages):
+            return
+        trace.mark(stage)
+
+    def traces(self, order: str = "recent", limit: int = 50) -> List[Dict[str, Any]]:
+        """Buffered traces, newest first or slowest first."""
+        traces = [trace for trace in self._ring if trace is not None]
+        if order == "slowest":
+            traces.sort(key=lambda trace: trace.total_ms, reverse=True)
+        else:
+            traces.sort(key=lambda trace: trace.started_at, reverse=True)
+        return [trace.asdict() for trace in traces[:limit]]
@@ -0,0 +1,46 @@
+"""AIMD behaviour of the send API concurrency limiter."""
+
+import pytest
+
+from gateway import admission
+from gateway.admission import AdaptiveLimiter, OverloadedError
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> _Clock:
+    clock = _Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return clock
+
+
+def test_slow_burst_backs_off_once(clock: _Clock) -> None:
+    limiter = AdaptiveLimiter("send", initial_limit=20, target_latency=1.0)
+
+    for _ in range(16):
+        limiter.observe(1.5)
+    assert limiter.limit == pytest.approx(18.0)
+
+    clock.now += 2.0
+    limiter.observe(1.5)
+    assert limiter.limit == pytest.approx(16.2)
+
+
+def test_rejects_over_limit_but_keeps_urgent_reserve() -> None:
+    limiter = AdaptiveLimiter("send", initial_limit=5, urgent_reserve=0.2)
+
+    with limiter.admit(), limiter.admit(), limiter.admit(), limiter.admit():
+        with pytest.raises(OverloadedError):
+            with limiter.admit():
+                pass
+        with limiter.admit(urgent=True):
+            pass
+
+    assert limiter.stats()["rejected"] == {"normal": 1, "urgent": 0}
@@ -0,0 +1,34 @@
+"""Webhook authentication in FeishuClient."""
+
+import asyncio
+from typing import List
+
+from gateway.events import IncomingMessageEvent
+from gateway.feishu_client import FeishuClient
+from gateway.feishu_stub import build_event
+
+
+def _client(received: List[IncomingMessageEvent], **kwargs) -> FeishuClient:
+    return FeishuClient("cli_test", "secret", on_message=received.append, **kwargs)
+
+
+def test_long_connection_rejects_webhook_events() -> None:
+    received: List[IncomingMessageEvent] = []
+    client = _client(received, verification_token="", event_mode="long_connection")
+    event = build_event("unlock the door")
+    event["header"]["token"] = ""
+
+    result = asyncio.run(client.handle_webhook(event))
+
+    assert result == {"success": False, "error": "webhook_disabled"}
+    assert received == []
+
+
+def test_webhook_rejects_wrong_token() -> None:
+    received: List[IncomingMessageEvent] = []
+    client = _client(received, verification_token="secret-token")
+
+    result = asyncio.run(client.handle_webhook(build_event("hello")))
+
+    assert result == {"success": False, "error": "invalid_token"}
+    assert received == []
@@ -0,0 +1,76 @@
+"""Long-connection codec and ack round trip against the local Feishu stand-in."""
+
+import asyncio
+from typing import Any, Dict, List
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+from gateway.feishu_stub import FeishuStub, build_event
+from gateway.feishu_ws import FRAME_DATA, Frame, FeishuLongConnection
+
+
+def test_frame_round_trip() -> None:
+    frame = Frame(
+        seq_id=300,
+        log_id=2**40,
+        service=7,
+        method=FRAME_DATA,
+        headers={"type": "event", "message_id": "m1", "sum": "1", "seq": "0", "biz_rt": "12"},
+        payload='{"text": "客厅温度"}'.encode(),
+    )
+
+    assert Frame.decode(frame.encode()) == frame
+
+
+def test_frame_round_trip_without_payload() -> None:
+    frame = Frame(service=1, headers={"type": "ping"})
+
+    assert Frame.decode(frame.encode()) == frame
+
+
+async def _inject(result: Dict[str, Any] | None = None, fail: bool = False) -> Dict[str, Any]:
+    """Push one event through the stub to a connected receiver and return the stub's response."""
+    stub = FeishuStub()
+    received: List[Dict[str, Any]] = []
+
+    async def on_event(event: Dict[str, Any]) -> Dict[str, Any] | None:
+        received.append(event)
+        if fail:
+            raise RuntimeError("handler failed")
+        return result
+
+    async with TestServer(stub.make_app()) as server:
+        domain = str(server.make_url("")).rstrip("/")
+        receiver = FeishuLongConnection("cli_test", "secret", on_event, domain=domain)
+        await receiver.start()
+        try:
+            assert await receiver.wait_connected(timeout=5)
+            event = build_event("hello")
+            async with aiohttp.ClientSession() as session:
+                async with session.post(f"{domain}/inject", json=event) as response:
+                    body = await response.json()
+        finally:
+            await receiver.stop()
+
+    assert received == [event]
+    assert stub._pending == {}
+    return body
+
+
+def test_ack_round_trip() -> None:
+    body = asyncio.run(_inject({"success": True}))
+
+    assert body["acks"] == [{"code": 200}]
+
+
+def test_failed_event_is_acked_as_error() -> None:
+    body = asyncio.run(_inject({"success": False, "error": "boom"}))
+
+    assert body["acks"] == [{"code": 500}]
+
+
+def test_handler_exception_is_acked_as_error() -> None:
+    body = asyncio.run(_inject(fail=True))
+
+    assert body["acks"] == [{"code": 500}]
@@ -0,0 +1,90 @@
+"""Request deduplication in IdempotencyCache."""
+
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+
+from gateway.admission import OverloadedError
+from gateway.idempotency import IdempotencyCache
+
+
+def _sender(calls: List[str], delay: float = 0.01, fail: bool = False):
+    def factory_for(key: str):
+        async def factory() -> Dict[str, Any]:
+            calls.append(key)
+            await asyncio.sleep(delay)
+            if fail:
+                raise RuntimeError("upstream failed")
+            return {"status": "sent", "key": key}
+        return factory
+    return factory_for
+
+
+def test_concurrent_and_repeated_calls_share_one_send() -> None:
+    async def scenario() -> None:
+        cache = IdempotencyCache()
+        calls: List[str] = []
+        send = _sender(calls)
+
+        results = await asyncio.gather(*[cache.run("k", send("k")) for _ in range(5)])
+        again = await cache.run("k", send("k"))
+
+        assert calls == ["k"]
+        assert all(result == {"status": "sent", "key": "k"} for result in results + [again])
+        assert cache.stats()["misses"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_first_caller_does_not_cancel_the_send() -> None:
+    async def scenario() -> None:
+        cache = IdempotencyCache()
+        calls: List[str] = []
+        send = _sender(calls, delay=0.05)
+
+        first = asyncio.create_task(cache.run("k", send("k")))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.run("k", send("k")))
+        await asyncio.sleep(0.01)
+        first.cancel()
+
+        assert await second == {"status": "sent", "key": "k"}
+        assert await cache.run("k", send("k")) == {"status": "sent", "key": "k"}
+        assert calls == ["k"]
+
+    asyncio.run(scenario())
+
+
+def test_failures_are_not_cached() -> None:
+    async def scenario() -> None:
+        cache = IdempotencyCache()
+        calls: List[str] = []
+
+        with pytest.raises(RuntimeError):
+            await cache.run("k", _sender(calls, fail=True)("k"))
+        await asyncio.sleep(0)
+        assert await cache.run("k", _sender(calls)("k")) == {"status": "sent", "key": "k"}
+        assert calls == ["k", "k"]
+
+    asyncio.run(scenario())
+
+
+def test_full_cache_never_evicts_inflight_calls() -> None:
+    async def scenario() -> None:
+        cache = IdempotencyCache(max_entries=2)
+        calls: List[str] = []
+        send = _sender(calls, delay=0.05)
+
+        a = asyncio.create_task(cache.run("a", send("a")))
+        b = asyncio.create_task(cache.run("b", send("b")))
+        await asyncio.sleep(0)
+        with pytest.raises(OverloadedError):
+            await cache.run("c", send("c"))
+        await asyncio.gather(a, b)
+
+        await cache.run("a", send("a"))
+        await cache.run("c", send("c"))
+        assert calls == ["a", "b", "c"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,138 @@
+"""Timing, cancellation and journal persistence of SendScheduler."""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from gateway.scheduler import SendScheduler
+
+
+class _Recorder:
+    """Fire callback that records sends and tracks peak concurrency."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.fired: List[Tuple[str, Dict[str, Any]]] = []
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, kind: str, payload: Dict[str, Any]) -> None:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            self.fired.append((kind, payload))
+        finally:
+            self.running -= 1
+
+
+async def _wait_for(condition, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def _journal_ids(path: Path) -> set:
+    return set(SendScheduler._read_journal(str(path)))
+
+
+def test_fires_in_due_order_and_skips_cancelled() -> None:
+    async def scenario() -> None:
+        fire = _Recorder()
+        scheduler = SendScheduler(fire)
+        await scheduler.start()
+        now = time.time()
+        scheduler.schedule("text", {"n": 2}, now + 0.10)
+        cancelled = scheduler.schedule("text", {"n": "x"}, now + 0.05)
+        scheduler.schedule("text", {"n": 1}, now + 0.02)
+
+        assert scheduler.cancel(cancelled)
+        assert not scheduler.cancel(cancelled)
+        await _wait_for(lambda: len(fire.fired) == 2)
+        await asyncio.sleep(0.05)
+        await scheduler.stop()
+
+        assert [payload["n"] for _, payload in fire.fired] == [1, 2]
+        assert scheduler.stats()["cancelled"] == 1
+        assert scheduler.stats()["pending"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_journal_is_replayed_after_restart(tmp_path: Path) -> None:
+    path = tmp_path / "schedule.jsonl"
+
+    async def first_run() -> Tuple[str, str]:
+        scheduler = SendScheduler(_Recorder(), store_path=str(path))
+        await scheduler.start()
+        keep = scheduler.schedule("text", {"content": "later"}, time.time() + 3600)
+        dropped = scheduler.schedule("text", {"content": "cancelled"}, time.time() + 3600)
+        scheduler.cancel(dropped)
+        await scheduler.stop()
+        return keep, dropped
+
+    keep, dropped = asyncio.run(first_run())
+    # A torn last line from a crash is ignored
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "id": "torn"')
+
+    async def second_run() -> None:
+        scheduler = SendScheduler(_Recorder(), store_path=str(path))
+        await scheduler.restore()
+        assert scheduler.stats()["pending"] == 1
+        assert not scheduler.cancel(dropped)
+        assert scheduler.cancel(keep)
+        await scheduler.stop()
+
+    asyncio.run(second_run())
+    assert _journal_ids(path) == set()
+
+
+def test_overdue_backlog_drains_with_bounded_concurrency(tmp_path: Path) -> None:
+    path = tmp_path / "schedule.jsonl"
+    overdue = time.time() - 60
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(500):
+            f.write(json.dumps({"op": "add", "id": f"j{i}", "due": overdue, "kind": "text", "payload": {}}) + "\n")
+
+    async def scenario() -> None:
+        fire = _Recorder(delay=0.001)
+        scheduler = SendScheduler(fire, store_path=str(path), max_concurrent=10)
+        await scheduler.start()
+        await _wait_for(lambda: len(fire.fired) == 500)
+        await scheduler.stop()
+        assert fire.peak == 10
+
+    asyncio.run(scenario())
+    assert _journal_ids(path) == set()
+
+
+def test_compaction_keeps_adds_and_dones_made_while_it_runs(tmp_path: Path) -> None:
+    path = tmp_path / "schedule.jsonl"
+
+    async def scenario() -> None:
+        scheduler = SendScheduler(_Recorder(), store_path=str(path), max_pending=100000)
+        await scheduler.restore()
+        far = time.time() + 3600
+        ids = [scheduler.schedule("text", {"i": i}, far) for i in range(5000)]
+
+        # Replace jobs one by one until the journal crosses the compaction
+        # threshold, yielding so adds and cancels interleave with the rewrite
+        compactions = 0
+        for i in range(20000):
+            assert scheduler.cancel(ids[i])
+            ids.append(scheduler.schedule("text", {"i": i}, far))
+            if scheduler._compaction is not None:
+                compactions += 1
+                await asyncio.sleep(0)
+        await _wait_for(lambda: scheduler._compaction is None)
+
+        pending = set(scheduler._jobs)
+        assert compactions > 0
+        assert _journal_ids(path) == pending
+        await scheduler.stop()
+
+    asyncio.run(scenario())